@@ -0,0 +1,38 @@
+"""
+file_utils.py - Helpers shared by the file-based movie storages.
+
+Functions:
+    atomic_write(path, serialize, mode, **open_kwargs): Replace a file without ever
+        leaving a half written version of it behind.
+"""
+
+import os
+import shutil
+
+
+def atomic_write(path, serialize, mode="w", **open_kwargs):
+    """
+    Write a file by passing a temporary file next to it to serialize(fileobj), then
+    moving it over the original, so a crash never leaves a half written file behind.
+    The original's permissions are kept, and the temporary file is removed on failure.
+
+    Args:
+        path (str): The path of the file to replace.
+        serialize (callable): Writes the new content to the file object it is given.
+        mode (str): The mode to open the temporary file with.
+        **open_kwargs: Further arguments for open(), such as encoding or newline.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode, **open_kwargs) as fileobj:
+            serialize(fileobj)
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+        # Keep the permissions of the file being replaced
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
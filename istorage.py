@@ -2,6 +2,10 @@ from abc import ABC, abstractmethod
 
 
 class IStorage(ABC):
+    _titles = None
+    _lower_titles = None
+    _version = 0
+
     @abstractmethod
     def list_movies(self):
         pass
@@ -17,3 +21,39 @@ class IStorage(ABC):
     @abstractmethod
     def update_movie(self, title, notes):
         pass
+
+    def flush(self):
+        """
+        Writes any pending changes to the underlying file.
+        """
+
+    def list_titles(self):
+        """
+        Returns a tuple of the movie titles, cached until the movies change.
+        """
+        if self._titles is None:
+            self._titles = tuple(self.list_movies())
+        return self._titles
+
+    def lower_titles(self):
+        """
+        Returns a list of (lowercased title, title) pairs, cached until the movies change.
+        """
+        if self._lower_titles is None:
+            self._lower_titles = [(title.lower(), title) for title in self.list_titles()]
+        return self._lower_titles
+
+    @property
+    def version(self):
+        """
+        A counter that increases every time the movies change.
+        """
+        return self._version
+
+    def _invalidate(self):
+        """
+        Drops everything cached from the movie data. Called after every modification.
+        """
+        self._titles = None
+        self._lower_titles = None
+        self._version += 1
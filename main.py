@@ -5,10 +5,14 @@ It imports the MovieApp class from the movie_app module and creates an instance
 to run the movie application.
 
 Usage:
-    python main.py
+    python main.py          # store the movies in movies.json
+    python main.py --csv    # store the movies in movies.csv
 
 """
 
+import argparse
+from functools import partial
+
 from storage_json import StorageJson
 from storage_csv import StorageCsv
 from movie_app import MovieApp
@@ -18,14 +22,21 @@ def main():
     """
     Main function to run the movie application.
 
-    It creates an instance of the MovieApp clas and calls the run() method to start the application.
+    It picks the storage from the command line arguments, creates an instance of the MovieApp
+    class and calls the run() method to start the application. The storage file is only read
+    once a command needs the movies.
 
     """
-    storage = StorageCsv("movies.csv")
-    jack = StorageJson("movies.json")
-    jack_app = MovieApp(jack)
-    movie_app = MovieApp(storage)
-    print(movie_app.run())
+    parser = argparse.ArgumentParser(description="Manage a movie database.")
+    parser.add_argument("--csv", action="store_true",
+                        help="store the movies in movies.csv instead of movies.json")
+    args = parser.parse_args()
+
+    if args.csv:
+        storage = partial(StorageCsv, "movies.csv")
+    else:
+        storage = partial(StorageJson, "movies.json")
+    MovieApp(storage).run()
 
 
 if __name__ == "__main__":
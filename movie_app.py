@@ -27,9 +27,27 @@ Date:
     23/06/2023
 """
 
-import statistics
+import heapq
+import os
 import random
+import numpy as np
 from colorama import Fore, Style
+from istorage import IStorage
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# HTML for a single movie card, filled in with %-formatting from the movie's info
+_CARD_TMPL = '<div class="movie">\n' \
+             '<img class="movie-poster" src="%(image-url)s" alt="%(title)s">\n' \
+             '<h2 class="movie-title">%(title)s</h2>\n' \
+             '<div class="movie-info">\n' \
+             '<p class="movie-year">Year: %(year)s</p>\n' \
+             '%(note_html)s' \
+             '</div>\n' \
+             '</div>\n'
 
 
 class MovieApp:
@@ -39,7 +57,57 @@ class MovieApp:
     """
 
     def __init__(self, movie_storage):
-        self._storage = movie_storage
+        """
+        Args:
+            movie_storage (IStorage or callable): The storage to use, or a function that
+                creates it. A function is only called once a command needs the movies.
+        """
+        self._movie_storage = movie_storage
+        self._stats_cache = None
+        self._template_cache = None
+        self._html_cache = None
+        self._columns_cache = None
+        self._dispatch = {
+            "1": self._handle_list_movies,
+            "2": self._handle_add_movie,
+            "3": self._handle_delete_movie,
+            "4": self._handle_update_movie,
+            "5": self._command_movie_stats,
+            "6": self._command_random_movie,
+            "7": self._handle_search_movie,
+            "8": self._command_generate_website,
+            "9": self._command_sort_movies,
+            "10": lambda: "Exiting the program"
+        }
+
+    @property
+    def _storage(self):
+        """
+        Returns the movie storage, creating it on first use.
+        """
+        if not isinstance(self._movie_storage, IStorage):
+            self._movie_storage = self._movie_storage()
+        return self._movie_storage
+
+    def _movie_columns(self):
+        """
+        Returns the movie titles and ratings as two parallel NumPy arrays.
+
+        Stats and sorting only need the ratings, so they are kept in their own
+        contiguous array instead of being read out of every movie dictionary.
+        The arrays are rebuilt only when the storage reports a change.
+
+        Returns:
+            tuple: An object array of titles and a float64 array of ratings.
+        """
+        version = self._storage.version
+        if self._columns_cache is None or self._columns_cache[0] != version:
+            movies = self._storage.list_movies()
+            titles = np.array(list(movies.keys()), dtype=object)
+            ratings = np.fromiter((info["rating"] for info in movies.values()),
+                                  dtype=np.float64, count=len(movies))
+            self._columns_cache = (version, titles, ratings)
+        return self._columns_cache[1], self._columns_cache[2]
 
     def _command_list_movies(self):
         """
@@ -85,7 +153,6 @@ class MovieApp:
         Returns:
             str: A message indicating the success or failure of deleting the movie.
         """
-
         return self._storage.delete_movie(movie_title)
 
     def _command_update_movie(self, movie_title, movie_note):
@@ -109,33 +176,30 @@ class MovieApp:
             str: A string containing the average rating,
                 median rating, the best movie, and the worst movie.
         """
-        movies = self._storage.list_movies()
-        ratings = []
-        for movie_data in movies.values():
-            ratings.append(movie_data["rating"])
-
-        # average
-        average_rating = statistics.mean(ratings)
-        result = f"Average rating: {average_rating}\n"
-
-        # median
-        median_rating = statistics.median(ratings)
-        result += f"Median rating: {median_rating}\n"
-
-        # best movie
-        best_movie = max(ratings)
-        for movie_title, movie_data in movies.items():
-            if movie_data["rating"] == best_movie:
-                result += f"The best movie: {Fore.GREEN}{movie_title}, " \
-                          f"Rating: {best_movie}{Style.RESET_ALL}\n"
-
-        # worst movie
-        worst_movie = min(ratings)
-        for movie_title, movie_data in movies.items():
-            if movie_data["rating"] == worst_movie:
-                result += f"The worst movie: {Fore.RED}{movie_title}, " \
-                          f"Rating: {worst_movie}{Style.RESET_ALL}"
+        # The result only changes when the storage reports a change
+        version = self._storage.version
+        if self._stats_cache is not None and self._stats_cache[0] == version:
+            return self._stats_cache[1]
 
+        titles, ratings = self._movie_columns()
+        if ratings.size == 0:
+            return "No movies in the database."
+
+        # Every movie tied for the best or worst rating gets its own line. The column
+        # only selects the movies, the rating is printed as it is stored
+        movies = self._storage.list_movies()
+        best_lines = [f"The best movie: {Fore.GREEN}{title}, "
+                      f"Rating: {movies[title]['rating']}{Style.RESET_ALL}\n"
+                      for title in titles[np.flatnonzero(ratings == ratings.max())]]
+        worst_lines = [f"The worst movie: {Fore.RED}{title}, "
+                       f"Rating: {movies[title]['rating']}{Style.RESET_ALL}"
+                       for title in titles[np.flatnonzero(ratings == ratings.min())]]
+
+        result = f"Average rating: {ratings.mean()}\n" \
+                 f"Median rating: {np.median(ratings)}\n" \
+                 + "".join(best_lines) + "\n".join(worst_lines)
+
+        self._stats_cache = (version, result)
         return result
 
     def _command_random_movie(self):
@@ -145,29 +209,44 @@ class MovieApp:
         Returns:
             str or None: The title of a random movie, or None if the database is empty.
         """
-        movie_data = self._storage.list_movies()
-        if len(movie_data) == 0:
+        titles = self._storage.list_titles()
+        if not titles:
             return None
 
-        random_title = random.choice(list(movie_data.keys()))
+        random_title = random.choice(titles)
         return f"The movie for the night is '{random_title}'"
 
-    def _command_search_movie(self, keyword):
+    def _command_search_movie(self, *keywords):
         """
-            Searches for movies in the database that match the provided keyword.
+            Searches for movies in the database that match any of the provided keywords.
+
+            When pyahocorasick is installed, several keywords are matched in a single
+            pass over each title.
 
             Args:
-                keyword (str): The keyword to search for in movie titles.
+                *keywords (str): The keywords to search for in movie titles.
 
             Returns:
-                list: A list of movie titles that match the keyword.
+                list: A list of movie titles that match at least one keyword.
         """
-        movie_data = self._storage.list_movies()
-        matches = []
-        for title in movie_data.keys():
-            if keyword.lower() in title.lower():
-                matches.append(title)
-        return matches
+        keywords = [keyword.lower() for keyword in keywords]
+
+        if ahocorasick is not None and len(keywords) > 1 and all(keywords):
+            automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            return [title for lower_title, title in self._storage.lower_titles()
+                    if next(automaton.iter(lower_title), None) is not None]
+
+        # A single keyword skips the per-title any() generator, which costs more than the search
+        if len(keywords) == 1:
+            keyword = keywords[0]
+            return [title for lower_title, title in self._storage.lower_titles()
+                    if keyword in lower_title]
+
+        return [title for lower_title, title in self._storage.lower_titles()
+                if any(keyword in lower_title for keyword in keywords)]
 
     def _command_serialise_website(self, movie_data):
         """
@@ -181,56 +260,70 @@ class MovieApp:
         Returns:
             str: HTML code representing the movie information for the website.
         """
-        output = ''
+        parts = []
         for movie_title, movie_info in movie_data.items():
-            image_url = movie_info.get("image-url")
-            if image_url:
-                output += '<div class="movie">\n'
-                output += f'<img class="movie-poster" src="{image_url}" alt="{movie_title}">\n'
-                output += f'<h2 class="movie-title">{movie_title}</h2>\n'
-                output += '<div class="movie-info">\n'
-                output += f'<p class="movie-year">Year: {movie_info["year"]}</p>\n'
-                if "note" in movie_info:
-                    output += f'<p class="movie-note">{movie_info["note"]}</p>\n'
-                output += '</div>\n'
-                output += '</div>\n'
-        return output
+            if movie_info.get("image-url"):
+                card = {
+                    **movie_info,
+                    "title": movie_title,
+                    "note_html": f'<p class="movie-note">{movie_info["note"]}</p>\n'
+                                 if "note" in movie_info else ""
+                }
+                parts.append(_CARD_TMPL % card)
+        return ''.join(parts)
 
     def _command_generate_website(self):
         """
         Generates the movie website.
 
-        The function reads the website template file, replaces the placeholders
-        with the serialized movie information,and saves the generated website to a file.
+        The function reads the website template file once, fills in the placeholders
+        with the serialized movie information, and saves the generated website to a file.
+        The generated page is reused until the storage reports a change, and the file
+        is not rewritten while it is still the one written last time.
         """
-        with open("index_template.html", "r", encoding="utf-8") as fileobj:
-            data = fileobj.read()
-            serialised_data = self._command_serialise_website \
-                (self._storage.list_movies())
-            html_replace_title = data.replace("__TEMPLATE_TITLE__", "My Movie App")
-            html_template_and_data_replace_text = html_replace_title. \
-                replace("__TEMPLATE_MOVIE_GRID__", serialised_data)
+        version = self._storage.version
+        if self._html_cache is not None and self._html_cache[0] == version:
+            _, html, written_mtime = self._html_cache
+            if os.path.exists("website.html") and \
+                    os.stat("website.html").st_mtime_ns == written_mtime:
+                return "Website has been generated"
+        else:
+            if self._template_cache is None:
+                with open("index_template.html", "r", encoding="utf-8") as fileobj:
+                    data = fileobj.read().replace("__TEMPLATE_TITLE__", "My Movie App")
+                prefix, _, suffix = data.partition("__TEMPLATE_MOVIE_GRID__")
+                self._template_cache = (prefix, suffix)
+
+            prefix, suffix = self._template_cache
+            serialised_data = self._command_serialise_website(self._storage.list_movies())
+            html = "".join([prefix, serialised_data, suffix])
 
         with open("website.html", "w", encoding="utf-8") as file:
-            file.write(html_template_and_data_replace_text)
+            file.write(html)
+        self._html_cache = (version, html, os.stat("website.html").st_mtime_ns)
 
         return "Website has been generated"
 
-    def _command_sort_movies(self) -> str:
+    def _command_sort_movies(self, k=None) -> str:
         """
         Sorts the movies from the lowest rating to the highest rating.
 
+        Args:
+            k (int, optional): Only return the k lowest rated movies. A heap selects
+                them in O(N log k) instead of sorting every movie.
+
         Returns:
             str: A string containing the sorted movies with their ratings.
         """
-        movie_data = self._storage.list_movies()
-        sorted_movies = sorted(movie_data.items(), key=lambda item: item[1]['rating'])
-
-        result = ""
-        for movie_title, values in sorted_movies:
-            result += f"Movie: {movie_title}, Rating: {values['rating']}\n"
-
-        return result
+        titles, ratings = self._movie_columns()
+        if k is None:
+            order = np.argsort(ratings, kind="stable")
+        else:
+            order = heapq.nsmallest(k, range(len(ratings)), key=ratings.__getitem__)
+        # The column only decides the order, the rating is printed as it is stored
+        movies = self._storage.list_movies()
+        return "".join(f"Movie: {movie_title}, Rating: {movies[movie_title]['rating']}\n"
+                       for movie_title in titles[order])
 
     def help_menu(self):
         """
@@ -248,6 +341,70 @@ class MovieApp:
         print("9. Sort movies")
         print("10. Exit program")
 
+    def _handle_list_movies(self):
+        """
+        Formats the movies in the database for the console.
+
+        Returns:
+            str: The title, rating and year of every movie.
+        """
+        movies = self._command_list_movies()
+        if movies:
+            return "".join(f"Title: {movie['Title']}\n"
+                           f"Rating: {movie['Rating']}\n"
+                           f"Year: {movie['Year']}\n\n"
+                           for movie in movies)
+        return "No movies in the database."
+
+    def _handle_add_movie(self):
+        """
+        Asks the user for the details of a movie and adds it to the database.
+
+        Returns:
+            str: A message indicating the success or failure of adding the movie.
+        """
+        movie_title = input("Enter Movie Title: ")
+        movie_year = input("Enter Movie Year: ")
+        movie_rating = float(input("Enter movie rating: "))
+        movie_poster = input("Enter poster url: ")
+        return self._command_add_movie(movie_title, movie_year, movie_rating, movie_poster)
+
+    def _handle_delete_movie(self):
+        """
+        Asks the user for a movie title and deletes that movie from the database.
+
+        Returns:
+            str: A message indicating the success or failure of deleting the movie.
+        """
+        movie_title = input("Enter movie Title: ")
+        return self._command_delete_movie(movie_title)
+
+    def _handle_update_movie(self):
+        """
+        Asks the user for a movie title and note and updates that movie in the database.
+
+        Returns:
+            str: A message indicating the success or failure of updating the movie.
+        """
+        movie_title = input("Enter movie Title: ")
+        movie_note = input("Enter movie note: ")
+        return self._command_update_movie(movie_title, movie_note)
+
+    def _handle_search_movie(self):
+        """
+        Asks the user for search keywords and formats the matching movie titles.
+
+        Returns:
+            str: The matching movie titles, one per line.
+        """
+        # "|" separates keywords, so titles containing commas can still be searched for
+        keywords = input("Enter keywords to search, separated by '|': ").split("|")
+        search_result = self._command_search_movie(
+            *(keyword.strip() for keyword in keywords if keyword.strip()))
+        if search_result:
+            return "Search Results:\n" + "\n".join(search_result)
+        return "No movies match the search."
+
     def execute_command(self, command):
         """
         Executes the given command.
@@ -258,75 +415,26 @@ class MovieApp:
         Returns:
             str: The output message of the command execution.
         """
-        if command == "1":
-            movie_result = ""
-            movies = self._command_list_movies()
-            if movies:
-                for movie in movies:
-                    movie_result += f"Title: {movie['Title']}\n"
-                    movie_result += f"Rating: {movie['Rating']}\n"
-                    movie_result += f"Year: {movie['Year']}\n\n"
-                return movie_result
-            return "No movies in the database."
-
-        elif command == "2":
-            movie_title = input("Enter Movie Title: ")
-            movie_year = input("Enter Movie Year: ")
-            movie_rating = float(input("Enter movie rating: "))
-            movie_poster = input("Enter poster url: ")
-            result = self._command_add_movie(movie_title, movie_year, movie_rating, movie_poster)
-            return result
-
-        elif command == "3":
-            movie_title = input("Enter movie Title: ")
-            result = self._command_delete_movie(movie_title)
-            return result
-
-        elif command == "4":
-            movie_title = input("Enter movie Title: ")
-            movie_note = input("Enter movie note: ")
-            result = self._command_update_movie(movie_title, movie_note)
-            return result
-
-        elif command == "5":
-            result = self._command_movie_stats()
-            return result
-
-        elif command == "6":
-            result = self._command_random_movie()
-            return result
-
-        elif command == "7":
-            keyword = input("Enter a keyword to search: ")
-            search_result = self._command_search_movie(keyword)
-            if search_result:
-                print("Search Results:")
-                for result in search_result:
-                    print(f"{result}")
-
-        elif command == "8":
-            result = self._command_generate_website()
-            return result
-
-        elif command == "9":
-            result = self._command_sort_movies()
-            return result
-
-        elif command == "10":
-            return "Exiting the program"
-
-        else:
+        handler = self._dispatch.get(command)
+        if handler is None:
             return "Invalid command. Please try again."
+        return handler()
 
     def run(self):
         """
         Runs the movie application.
         """
         print("Welcome to the Movie App!")
-        while True:
-            self.help_menu()
-            command = input("Enter a command (1-10): ")
-            result = self.execute_command(command)
-            print(result)
-            if command == "10":
-                break
+        try:
+            while True:
+                self.help_menu()
+                command = input("Enter a command (1-10): ")
+                result = self.execute_command(command)
+                print(result)
+                if command == "10":
+                    break
+        finally:
+            # Persist changes the storage has held back, even if the app is interrupted.
+            # A storage that was never created has nothing to persist
+            if isinstance(self._movie_storage, IStorage):
+                self._movie_storage.flush()
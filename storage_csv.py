@@ -15,12 +15,25 @@ Usage:
         - add_movie(title, year, rating, poster): Add a new movie to the CSV file.
         - delete_movie(title): Delete a movie from the CSV file.
         - update_movie(title, notes): Update the notes of a movie in the CSV file.
+        - add_movies(movies): Add several movies to the CSV file at once.
+    3. New movies are appended to the CSV file instead of rewriting it, and add_movies()
+       appends a whole batch with a single write. Deletes and updates rewrite the file.
 """
 
 import csv
+import os
+from file_utils import atomic_write
 from istorage import IStorage
 
 
+def _parse_year(year):
+    """
+    Convert a plain year to int, keeping ranges such as '2002-2007' as they are.
+    """
+    year = str(year).strip()
+    return int(year) if year.isdigit() else year
+
+
 class StorageCsv(IStorage):
     """
     A storage implementation using a CSV file to store movie data.
@@ -34,13 +47,14 @@ class StorageCsv(IStorage):
     Attributes:
         header (list[str]): The header of the CSV file, specifying the column names.
         file_path (str): The file path to the CSV file.
-        data (list[dict]): The list of dictionaries representing movie data read from the CSV file.
+        data (dict[str, dict]): The rows read from the CSV file, keyed by movie title.
 
     Methods:
         list_movies(): Retrieve a dictionary of movies from the CSV file.
         add_movie(title, year, rating, poster): Add a new movie to the CSV file.
         delete_movie(title): Delete a movie from the CSV file.
         update_movie(title, notes): Update the notes of a movie in the CSV file.
+        add_movies(movies): Add several movies to the CSV file at once.
 
     """
 
@@ -54,13 +68,87 @@ class StorageCsv(IStorage):
         """
         self.header = ['title', 'year', 'rating', 'poster', 'notes']
         self.file_path = file_path
-        self.data = []
 
-        # Read the existing data from the CSV file
+        # Read the existing data from the CSV file, converting the year and rating only once.
+        # Fields are read by position, so no intermediate dict is built per row
+        self.data = {}
         with open(self.file_path, "r", encoding="UTF-8", newline='') as fileobj:
-            reader = csv.DictReader(fileobj, delimiter=",")
-            for data in reader:
-                self.data.append(data)
+            reader = csv.reader(fileobj, delimiter=",")
+            file_header = next(reader, None) or []
+            missing = [name for name in ('title', 'year', 'rating', 'poster')
+                       if name not in file_header]
+            if file_header and missing:
+                raise ValueError(f"{self.file_path}: the header has no "
+                                 f"{', '.join(missing)} column")
+
+            # Columns we do not know about are kept, so rewriting the file never drops them
+            extra_columns = [name for name in file_header if name not in self.header]
+            self._fieldnames = self.header + extra_columns
+            positions = [file_header.index(name) if name in file_header else len(file_header)
+                         for name in self._fieldnames]
+            width = len(file_header) + 1
+            for row in reader:
+                if not row:
+                    continue
+                # Short rows get empty fields, like DictReader filling in missing values
+                if len(row) < width:
+                    row += [''] * (width - len(row))
+                title, year, rating, poster, notes, *extra = (row[i] for i in positions)
+                try:
+                    rating = float(rating)
+                except ValueError:
+                    raise ValueError(f"{self.file_path}, line {reader.line_num}: "
+                                     f"invalid rating {rating!r}") from None
+                self.data[title] = {
+                    'title': title,
+                    'year': _parse_year(year),
+                    'rating': rating,
+                    'poster': poster,
+                    'notes': notes
+                }
+                if extra:
+                    self.data[title].update(zip(extra_columns, extra))
+
+        # New rows can only be appended to a file that already has our header
+        # and ends with a complete line, otherwise the next write must be a full rewrite
+        self._needs_full_rewrite = file_header != self._fieldnames or \
+            not self._ends_with_newline()
+
+    def _ends_with_newline(self):
+        """
+        Check whether the CSV file ends with a line break.
+        """
+        with open(self.file_path, "rb") as fileobj:
+            if fileobj.seek(0, os.SEEK_END) == 0:
+                return False
+            fileobj.seek(-1, os.SEEK_END)
+            return fileobj.read(1) == b"\n"
+
+    def _write(self):
+        """
+        Write all the movies in self.data to the CSV file.
+        """
+        def write_rows(fileobj):
+            writer = csv.DictWriter(fileobj, fieldnames=self._fieldnames, delimiter=",")
+            writer.writeheader()
+            writer.writerows(self.data.values())
+
+        atomic_write(self.file_path, write_rows, encoding="UTF-8", newline='')
+        self._needs_full_rewrite = False
+
+    def _append(self, titles):
+        """
+        Append the given movies from self.data to the end of the CSV file.
+
+        Falls back to a full rewrite when the file cannot simply be extended.
+        """
+        if self._needs_full_rewrite:
+            self._write()
+            return
+
+        with open(self.file_path, "a", encoding="UTF-8", newline='') as fileobj:
+            writer = csv.DictWriter(fileobj, fieldnames=self._fieldnames, delimiter=",")
+            writer.writerows(self.data[title] for title in titles)
 
     def list_movies(self):
         """
@@ -69,19 +157,12 @@ class StorageCsv(IStorage):
         Returns:
             dict: A dictionary of movies with the movie title as the key
             and movie details as the value. Each movie detail is represented
-            by a dictionary with keys 'year', 'rating', and 'poster'.
+            by its CSV row, a dictionary with keys 'title', 'year', 'rating',
+            'poster' and 'notes'.
+            The dictionary is empty when there are no movies.
 
         """
-        dictionary = {}
-        for key in self.data:
-            dictionary[key['title']] = {
-                'year': key['year'],
-                'rating': key['rating'],
-                'poster': key['poster']
-            }
-        if not dictionary:
-            return "Empty Database..."
-        return dictionary
+        return self.data
 
     def add_movie(self, title, year, rating, poster):
         """
@@ -89,36 +170,59 @@ class StorageCsv(IStorage):
 
         Args:
             title (str): The title of the movie.
-            year (str): The year of the movie.
-            rating (str): The rating of the movie.
+            year (str | int): The year of the movie.
+            rating (str | float): The rating of the movie.
             poster (str): The poster URL of the movie.
 
         Returns:
             str: A message indicating the result of the operation.
 
         """
-        movie_data = self.list_movies()
-        if title in movie_data:
+        if title in self.data:
             return "Movie already exists"
 
-        # Create a new movie dictionary
-        movie = {
+        self.data[title] = {
             'title': title,
-            'year': year,
-            'rating': rating,
-            'poster': poster
+            'year': _parse_year(year),
+            'rating': float(rating),
+            'poster': poster,
+            'notes': ''
         }
+        self._invalidate()
+        self._append([title])
 
-        # Add the movie to self.data
-        self.data.append(movie)
+        return f"{title} added to the database"
 
-        # Write the updated data to the CSV file
-        with open(self.file_path, "w", encoding="UTF-8", newline='') as fileobj:
-            writer = csv.DictWriter(fileobj, fieldnames=self.header)
-            writer.writeheader()
-            writer.writerows(self.data)
+    def add_movies(self, movies):
+        """
+        Add several movies to the CSV file with a single write.
 
-        return f"{title} added to the database"
+        Args:
+            movies (iterable): (title, year, rating, poster) tuples of the movies to add.
+                Movies that already exist are skipped.
+
+        Returns:
+            str: A message indicating the result of the operation.
+
+        """
+        added = []
+        for title, year, rating, poster in movies:
+            if title in self.data:
+                continue
+            self.data[title] = {
+                'title': title,
+                'year': _parse_year(year),
+                'rating': float(rating),
+                'poster': poster,
+                'notes': ''
+            }
+            added.append(title)
+
+        if added:
+            self._invalidate()
+            self._append(added)
+
+        return f"{len(added)} movies added to the database"
 
     def delete_movie(self, title):
         """
@@ -131,15 +235,12 @@ class StorageCsv(IStorage):
             str: A message indicating the result of the operation.
 
         """
-        for movie in self.data:
-            if title == movie['title']:
-                self.data.remove(movie)
-                with open(self.file_path, "w", encoding="UTF-8") as fileobj:
-                    writer = csv.DictWriter(fileobj, fieldnames=self.header, delimiter=",")
-                    writer.writeheader()
-                    writer.writerows(self.data)
-                return f"{title} has been deleted from the database"
-        return f"{title} does not exist in the database"
+        if self.data.pop(title, None) is None:
+            return f"{title} does not exist in the database"
+
+        self._invalidate()
+        self._write()
+        return f"{title} has been deleted from the database"
 
     def update_movie(self, title, notes):
         """
@@ -153,15 +254,13 @@ class StorageCsv(IStorage):
             str: A message indicating the result of the operation.
 
         """
-        for movie in self.data:
-            if title == movie['title']:
-                movie['notes'] = notes
-
-        with open(self.file_path, "w", encoding="UTF-8", newline='') as fileobj:
-            writer = csv.DictWriter(fileobj, fieldnames=self.header, delimiter=",")
-            writer.writeheader()
-            writer.writerows(self.data)
-
-        if any(movie['title'] == title for movie in self.data):
-            return f"{title} has been updated"
-        return f"{title} does not exist"
+        movie = self.data.get(title)
+        if movie is None:
+            return f"{title} does not exist"
+
+        # Only an actual change needs the file to be rewritten
+        if movie['notes'] != notes:
+            movie['notes'] = notes
+            self._invalidate()
+            self._write()
+        return f"{title} has been updated"
@@ -36,14 +36,29 @@ Note:
     - The JSON file must contain a dictionary with movie titles as keys and movie details
       (year, rating, poster) as values.
     - The file is read and overwritten when the StorageJson instance is initialized.
-    - The 'add_movie', 'delete_movie', and 'update_movie' methods modify the JSON file
-      directly.
+    - The 'add_movie', 'delete_movie', and 'update_movie' methods append each change to a
+      '.log' file next to the JSON file instead of rewriting it. Call 'flush()' to write the
+      JSON file once and clear the log. Changes left in the log are replayed on start-up.
 
 """
 
-import json
+import os
+from file_utils import atomic_write
 from istorage import IStorage
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+
+def _dumps(data):
+    """
+    Serialize data to UTF-8 encoded JSON with orjson, or the json module when it is missing.
+    """
+    dumped = _json.dumps(data)
+    return dumped if isinstance(dumped, bytes) else dumped.encode("utf-8")
+
 
 class StorageJson(IStorage):
     """
@@ -61,6 +76,7 @@ class StorageJson(IStorage):
         add_movie(title, year, rating, poster): Adds a new movie to the database.
         delete_movie(title): Deletes a movie from the database.
         update_movie(title, notes): Updates the notes of a movie in the database.
+        flush(): Writes pending changes to the JSON file.
     """
 
     def __init__(self, file_path):
@@ -71,8 +87,87 @@ class StorageJson(IStorage):
             file_path (str): The path to the JSON file.
         """
         self.file_path = file_path
-        with open(self.file_path, "r", encoding="utf-8") as fileobj:
-            self.data = json.load(fileobj)
+        self._log_path = file_path + ".log"
+        with open(self.file_path, "rb") as fileobj:
+            self.data = _json.loads(fileobj.read())
+
+        # Fold changes logged since the last flush into the JSON file, so new
+        # entries are never appended after a partially written line
+        self._dirty = self._replay_log()
+        self.flush()
+
+        # Maps each lowercased title to every spelling of it stored in self.data
+        self._lower_index = {}
+        for movie_title in self.data:
+            self._lower_index.setdefault(movie_title.lower(), []).append(movie_title)
+
+    def _matching_titles(self, title):
+        """
+        Find the stored titles that match the given title case-insensitively.
+
+        Args:
+            title (str): The title to look up.
+
+        Returns:
+            list: The matching titles, with an exact match first.
+        """
+        matches = self._lower_index.get(title.lower(), [])
+        if title in self.data:
+            return [title] + [movie_title for movie_title in matches if movie_title != title]
+        return list(matches)
+
+    def _replay_log(self):
+        """
+        Apply the changes recorded in the log file to self.data.
+
+        Returns:
+            bool: True if a log file was found.
+        """
+        if not os.path.exists(self._log_path):
+            return False
+
+        with open(self._log_path, "rb") as fileobj:
+            for line in fileobj:
+                try:
+                    entry = _json.loads(line)
+                except ValueError:
+                    # A partially written last line means the app stopped mid-write
+                    break
+                if entry["op"] == "add":
+                    self.data[entry["title"]] = entry["movie"]
+                elif entry["op"] == "delete":
+                    self.data.pop(entry["title"], None)
+                elif entry["op"] == "update" and entry["title"] in self.data:
+                    self.data[entry["title"]]["note"] = entry["note"]
+        return True
+
+    def _log(self, entry):
+        """
+        Append a single change to the log file and mark the JSON file as out of date.
+        """
+        with open(self._log_path, "ab") as fileobj:
+            fileobj.write(_dumps(entry) + b"\n")
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+        self._dirty = True
+
+    def _save(self):
+        """
+        Write all the movies in self.data to the JSON file.
+        """
+        atomic_write(self.file_path, lambda fileobj: fileobj.write(_dumps(self.data)), "wb")
+
+    def flush(self):
+        """
+        Write pending changes to the JSON file and clear the log.
+        """
+        if not self._dirty:
+            return
+
+        self._save()
+        if os.path.exists(self._log_path):
+            os.remove(self._log_path)
+        self._dirty = False
 
     def list_movies(self):
         """
@@ -104,9 +199,10 @@ class StorageJson(IStorage):
             'rating': rating,
             'image-url': poster
         }
+        self._lower_index.setdefault(title.lower(), []).append(title)
+        self._invalidate()
 
-        with open(self.file_path, "w", encoding="utf-8") as fileobj:
-            json.dump(self.data, fileobj)
+        self._log({"op": "add", "title": title, "movie": self.data[title]})
 
         return f"{title} has been added to the database"
 
@@ -120,13 +216,19 @@ class StorageJson(IStorage):
         Returns:
             str: A message indicating the status of the operation.
         """
-        for movie_title in self.data:
-            if title.lower() == movie_title.lower():
-                del self.data[movie_title]
-                with open(self.file_path, "w", encoding="utf-8") as fileobj:
-                    json.dump(self.data, fileobj)
-                return f"{title} has been deleted from the database"
-        return f"{title} does not exist in the database"
+        matches = self._matching_titles(title)
+        if not matches:
+            return f"{title} does not exist in the database"
+
+        movie_title = matches[0]
+        spellings = self._lower_index[movie_title.lower()]
+        spellings.remove(movie_title)
+        if not spellings:
+            del self._lower_index[movie_title.lower()]
+        del self.data[movie_title]
+        self._invalidate()
+        self._log({"op": "delete", "title": movie_title})
+        return f"{title} has been deleted from the database"
 
     def update_movie(self, title, notes):
         """
@@ -139,12 +241,14 @@ class StorageJson(IStorage):
         Returns:
             str: A message indicating the status of the operation.
         """
-        movie_database = self.data
-
-        for movie_title, values in movie_database.items():
-            if title.lower() == movie_title.lower() and 'image-url' in values:
-                self.data[movie_title]['note'] = notes
-                with open(self.file_path, "w", encoding="utf-8") as fileobj:
-                    json.dump(self.data, fileobj)
-                return f"Note added to the movie '{movie_title}' successfully. Now try to hover over the movie"
-        return "Movie does not exist or does not have an 'image-url' field."
+        movie_title = next((movie_title for movie_title in self._matching_titles(title)
+                            if 'image-url' in self.data[movie_title]), None)
+        if movie_title is None:
+            return "Movie does not exist or does not have an 'image-url' field."
+
+        # Only an actual change needs to be logged
+        if self.data[movie_title].get('note') != notes:
+            self.data[movie_title]['note'] = notes
+            self._invalidate()
+            self._log({"op": "update", "title": movie_title, "note": notes})
+        return f"Note added to the movie '{movie_title}' successfully. Now try to hover over the movie"